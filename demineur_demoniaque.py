@@ -3,6 +3,11 @@ import sys
 import pygame
 import random
 import time
+import json
+import math
+import multiprocessing
+import queue
+from collections import deque
 
 EASY = (9, 9, 10)
 MEDIUM = (16, 16, 40)
@@ -105,11 +110,590 @@ class Cell:
         self.is_flagged = False
         self.adjacent_mines = 0
 
+# Au-delà, une composante est estimée au lieu d'être énumérée
+MAX_ENUMERATION_NODES = 50000
+
+class _CalculAnnule(Exception):
+    pass
+
+class _TropComplexe(Exception):
+    pass
+
+def split_components(constraints):
+    """
+    Regroupe les contraintes (cases, nombre de mines) qui partagent des cases.
+    Renvoie une liste de frozenset de contraintes.
+    """
+    parent = {}
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+    for cells, _ in constraints:
+        first = None
+        for cell in cells:
+            parent.setdefault(cell, cell)
+            if first is None:
+                first = find(cell)
+            else:
+                parent[find(cell)] = first
+
+    groups = {}
+    for constraint in constraints:
+        root = find(next(iter(constraint[0])))
+        groups.setdefault(root, set()).add(constraint)
+    return [frozenset(group) for group in groups.values()]
+
+def frontier_components(snapshot):
+    """
+    snapshot[r][c] vaut None pour une case cachée, sinon le nombre de mines voisines.
+    Renvoie les composantes de la frontière (frozenset de contraintes) et
+    l'ensemble des cases cachées hors frontière.
+    """
+    num_rows, num_cols = len(snapshot), len(snapshot[0])
+    constraints = []
+    frontier = set()
+    for r in range(num_rows):
+        for c in range(num_cols):
+            value = snapshot[r][c]
+            if value is None:
+                continue
+            hidden = frozenset(
+                (rr, cc)
+                for rr in range(max(0, r-1), min(num_rows, r+2))
+                for cc in range(max(0, c-1), min(num_cols, c+2))
+                if snapshot[rr][cc] is None
+            )
+            if hidden:
+                constraints.append((hidden, value))
+                frontier |= hidden
+
+    outside = {
+        (r, c)
+        for r in range(num_rows)
+        for c in range(num_cols)
+        if snapshot[r][c] is None and (r, c) not in frontier
+    }
+    return split_components(constraints), outside
+
+def settle_forced(constraints):
+    """
+    Fixe les cases forcées (contrainte pleine ou vide, puis règle des
+    sous-ensembles). Renvoie (mines, sûres, contraintes restantes),
+    ou None si les contraintes sont incohérentes.
+    """
+    constraints = set(constraints)
+    mines, safe = set(), set()
+    changed = True
+    while changed:
+        changed = False
+        reduced = set()
+        for cells, n in constraints:
+            rest = cells - mines - safe
+            n -= len(cells & mines)
+            if n < 0 or n > len(rest):
+                return None
+            if rest:
+                reduced.add((frozenset(rest), n))
+        constraints = reduced
+
+        for cells, n in constraints:
+            if n == 0:
+                safe |= cells
+                changed = True
+            elif n == len(cells):
+                mines |= cells
+                changed = True
+        if changed:
+            if mines & safe:
+                return None
+            continue
+
+        by_cell = {}
+        for constraint in constraints:
+            for cell in constraint[0]:
+                by_cell.setdefault(cell, []).append(constraint)
+        for small_cells, small_n in constraints:
+            neighbours = {other for cell in small_cells for other in by_cell[cell]}
+            for big_cells, big_n in neighbours:
+                if small_cells < big_cells:
+                    diff = big_cells - small_cells
+                    extra = big_n - small_n
+                    if extra < 0 or extra > len(diff):
+                        return None
+                    if extra == 0:
+                        safe |= diff
+                        changed = True
+                    elif extra == len(diff):
+                        mines |= diff
+                        changed = True
+        if mines & safe:
+            return None
+    return mines, safe, constraints
+
+def backtrack_component(component, cancelled=None, max_nodes=MAX_ENUMERATION_NODES):
+    """
+    Énumère exactement les configurations d'une composante sans case forcée.
+    Renvoie (cases, tallies) où tallies[k] = [nombre de solutions à k mines,
+    nombre de solutions où chaque case est une mine].
+    """
+    constraints = list(component)
+    neighbours = {}
+    for cs, _ in constraints:
+        for cell in cs:
+            neighbours.setdefault(cell, set()).update(cs)
+
+    # Parcours en largeur : les contraintes se ferment au plus tôt
+    cells = []
+    seen = set()
+    for start in sorted(neighbours):
+        if start in seen:
+            continue
+        seen.add(start)
+        to_visit = deque([start])
+        while to_visit:
+            cell = to_visit.popleft()
+            cells.append(cell)
+            for other in sorted(neighbours[cell] - seen):
+                seen.add(other)
+                to_visit.append(other)
+
+    index = {cell: i for i, cell in enumerate(cells)}
+    cell_constraints = [[] for _ in cells]
+    for ci, (cs, _) in enumerate(constraints):
+        for cell in cs:
+            cell_constraints[index[cell]].append(ci)
+    need = [n for _, n in constraints]
+    left = [len(cs) for cs, _ in constraints]
+    assignment = [0] * len(cells)
+    tallies = {}
+    nodes = [0]
+
+    def backtrack(i, mines):
+        nodes[0] += 1
+        if nodes[0] > max_nodes:
+            raise _TropComplexe()
+        if nodes[0] % 1024 == 0 and cancelled is not None and cancelled():
+            raise _CalculAnnule()
+        if i == len(cells):
+            entry = tallies.setdefault(mines, [0, [0] * len(cells)])
+            entry[0] += 1
+            for j, v in enumerate(assignment):
+                entry[1][j] += v
+            return
+        for value in (0, 1):
+            if any(need[ci] - value < 0 or need[ci] - value > left[ci] - 1
+                   for ci in cell_constraints[i]):
+                continue
+            for ci in cell_constraints[i]:
+                need[ci] -= value
+                left[ci] -= 1
+            assignment[i] = value
+            backtrack(i + 1, mines + value)
+            for ci in cell_constraints[i]:
+                need[ci] += value
+                left[ci] += 1
+        assignment[i] = 0
+
+    backtrack(0, 0)
+    return cells, tallies
+
+def approximate_component(component, iterations=50):
+    """
+    Estimation pour une composante trop grande : on ajuste les probabilités
+    contrainte par contrainte jusqu'à ce que chaque somme colle au nombre attendu.
+    """
+    cells = sorted({cell for cs, _ in component for cell in cs})
+    probability = {cell: 0.5 for cell in cells}
+    for _ in range(iterations):
+        for cs, n in component:
+            total = sum(probability[cell] for cell in cs)
+            for cell in cs:
+                if total > 0:
+                    probability[cell] = min(1.0, probability[cell] * n / total)
+                else:
+                    probability[cell] = n / len(cs)
+    # Une estimation ne doit jamais afficher une certitude
+    values = [min(max(probability[cell], 0.01), 0.99) for cell in cells]
+    return cells, {round(sum(values)): [1, values]}
+
+def combine_tallies(first, second):
+    cells_a, tallies_a = first
+    cells_b, tallies_b = second
+    tallies = {}
+    for ka, (count_a, per_a) in tallies_a.items():
+        for kb, (count_b, per_b) in tallies_b.items():
+            entry = tallies.setdefault(ka + kb, [0, [0] * (len(cells_a) + len(cells_b))])
+            entry[0] += count_a * count_b
+            for j, value in enumerate(per_a):
+                entry[1][j] += value * count_b
+            for j, value in enumerate(per_b):
+                entry[1][len(cells_a) + j] += count_a * value
+    return cells_a + cells_b, tallies
+
+def enumerate_component(component, cancelled=None, max_nodes=MAX_ENUMERATION_NODES):
+    """
+    Fixe d'abord les cases forcées, redécoupe ce qui reste, puis énumère
+    chaque sous-composante ; celles qui dépassent max_nodes sont estimées.
+    Renvoie (cases, tallies) comme backtrack_component.
+    """
+    settled = settle_forced(component)
+    if settled is None:
+        return [], {}
+    mines, safe, remaining = settled
+
+    forced = sorted(mines) + sorted(safe)
+    result = (forced, {len(mines): [1, [1] * len(mines) + [0] * len(safe)]})
+    for sub in split_components(remaining):
+        try:
+            part = backtrack_component(sub, cancelled, max_nodes)
+        except _TropComplexe:
+            part = approximate_component(sub)
+        result = combine_tallies(result, part)
+    return result
+
+def compute_frontier_probabilities(snapshot, num_mines, cache=None, cancelled=None):
+    """
+    Probabilité de mine pour chaque case cachée de la frontière.
+    cache associe une composante à son énumération : les composantes que le
+    dernier coup n'a pas touchées ne sont pas recalculées.
+    """
+    components, outside = frontier_components(snapshot)
+    if cache is None:
+        cache = {}
+    enumerated = []
+    for component in components:
+        if component not in cache:
+            cache[component] = enumerate_component(component, cancelled)
+        enumerated.append(cache[component])
+    # On ne garde que les composantes encore présentes
+    live = set(components)
+    for key in list(cache):
+        if key not in live:
+            del cache[key]
+
+    def convolve(dist, tallies):
+        result = {}
+        for a, wa in dist.items():
+            for k, (count, _) in tallies.items():
+                result[a + k] = result.get(a + k, 0) + wa * count
+        return result
+
+    probabilities = {}
+    outside_count = len(outside)
+    for i, (cells, tallies) in enumerate(enumerated):
+        others = {0: 1}
+        for j, (_, other_tallies) in enumerate(enumerated):
+            if j != i:
+                others = convolve(others, other_tallies)
+
+        weights = {
+            k: sum(
+                w * math.comb(outside_count, num_mines - k - m)
+                for m, w in others.items()
+                if 0 <= num_mines - k - m <= outside_count
+            )
+            for k in tallies
+        }
+        # Les poids entiers peuvent dépasser les flottants : on les normalise
+        largest = max(weights.values(), default=0)
+        if largest == 0:
+            continue
+        total = 0
+        per_cell = [0] * len(cells)
+        for k, (count, cell_counts) in tallies.items():
+            weight = weights[k] / largest
+            total += count * weight
+            for j, cell_count in enumerate(cell_counts):
+                per_cell[j] += cell_count * weight
+        if total == 0:
+            continue
+        for cell, value in zip(cells, per_cell):
+            probabilities[cell] = value / total
+    return probabilities
+
+def _probability_process(requests, results, generation, num_mines):
+    # Boucle du processus de calcul : le cache des composantes vit ici
+    if hasattr(os, "nice"):
+        # Sur un seul cœur, la boucle de jeu passe avant le calcul
+        os.nice(10)
+    cache = {}
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        request_generation, snapshot = item
+        if request_generation != generation.value:
+            continue
+        try:
+            probabilities = compute_frontier_probabilities(
+                snapshot, num_mines, cache,
+                lambda: generation.value != request_generation
+            )
+        except _CalculAnnule:
+            continue
+        results.put((request_generation, probabilities))
+
+class ProbabilityWorker:
+    """
+    Processus de fond qui calcule la carte de probabilités hors de la boucle de jeu
+    (un processus, pour ne pas disputer le GIL à l'affichage).
+    Le processus n'est lancé qu'au premier start() : la plupart des parties
+    n'affichent jamais la carte.
+    Chaque submit() annule le calcul en cours ; le résultat est récupéré par poll().
+    """
+    def __init__(self, num_mines):
+        self.num_mines = num_mines
+        self._generation = multiprocessing.RawValue("i", 0)
+        self._process = None
+
+    def start(self):
+        if self._process is not None:
+            return
+        self._requests = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_probability_process,
+            args=(self._requests, self._results, self._generation, self.num_mines),
+            daemon=True
+        )
+        self._process.start()
+
+    def submit(self, snapshot):
+        self.start()
+        self._generation.value += 1
+        self._requests.put((self._generation.value, snapshot))
+
+    def cancel(self):
+        self._generation.value += 1
+
+    def poll(self):
+        # Renvoie le dernier résultat à jour une seule fois, None sinon
+        result = None
+        if self._process is None:
+            return result
+        while True:
+            try:
+                generation, probabilities = self._results.get_nowait()
+            except queue.Empty:
+                return result
+            if generation == self._generation.value:
+                result = probabilities
+
+    def stop(self):
+        if self._process is None or not self._process.is_alive():
+            return
+        self._generation.value += 1
+        self._requests.put(None)
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+
+class ClickLatencyTracer:
+    """
+    Mesure le délai entre un clic (sorti de pygame.event.get()) et le
+    display.flip qui en affiche le résultat, découpé en action / rendu / flip.
+    """
+    BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 200, 500, 1000)
+    MAX_SAMPLES = 2000
+
+    def __init__(self):
+        self.pending = []
+        self.samples = {}
+        # Trace du clic en cours de traitement
+        self.current = None
+
+    def start(self, pulled_at):
+        trace = {"action": None, "pulled": pulled_at, "action_done": None, "rendered": None}
+        self.pending.append(trace)
+        self.current = trace
+        return trace
+
+    def action_done(self, trace, action):
+        trace["action"] = action
+        trace["action_done"] = time.perf_counter()
+
+    def end_of_game(self, action):
+        # Le clic qui termine la partie est affiché par l'écran de fin, pas par run_frame
+        trace = self.current
+        if trace is not None and trace["action"] is None:
+            trace["action"] = action
+            trace["action_done"] = time.perf_counter()
+
+    def rendered(self):
+        now = time.perf_counter()
+        for trace in self.pending:
+            trace["rendered"] = now
+
+    def flipped(self):
+        now = time.perf_counter()
+        for trace in self.pending:
+            # Clic hors grille et hors boutons => rien à afficher
+            if trace["action"] is None:
+                continue
+            rendered = trace["rendered"] if trace["rendered"] is not None else now
+            sample = (
+                (trace["action_done"] - trace["pulled"]) * 1000,
+                (rendered - trace["action_done"]) * 1000,
+                (now - rendered) * 1000,
+                (now - trace["pulled"]) * 1000,
+            )
+            samples = self.samples.setdefault(trace["action"], [])
+            samples.append(sample)
+            if len(samples) > self.MAX_SAMPLES:
+                del samples[0]
+        self.pending = []
+        self.current = None
+
+    @staticmethod
+    def percentile(values, pct):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def histogram(self, action):
+        totals = [sample[3] for sample in self.samples.get(action, [])]
+        labels = [f"<={edge}ms" for edge in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        buckets = dict.fromkeys(labels, 0)
+        for total in totals:
+            for edge, label in zip(self.BUCKETS_MS, labels):
+                if total <= edge:
+                    buckets[label] += 1
+                    break
+            else:
+                buckets[labels[-1]] += 1
+        return buckets
+
+    def summary(self, action):
+        samples = self.samples.get(action, [])
+        totals = [sample[3] for sample in samples]
+        count = len(samples)
+        return {
+            "count": count,
+            "p50_ms": self.percentile(totals, 50),
+            "p95_ms": self.percentile(totals, 95),
+            "max_ms": max(totals, default=0.0),
+            "mean_action_ms": sum(s[0] for s in samples) / count if count else 0.0,
+            "mean_render_ms": sum(s[1] for s in samples) / count if count else 0.0,
+            "mean_flip_ms": sum(s[2] for s in samples) / count if count else 0.0,
+            "histogram": self.histogram(action),
+        }
+
+    def export(self):
+        return {action: self.summary(action) for action in self.samples}
+
+    def export_json(self, filepath="click_latency.json"):
+        with open(filepath, "w") as f:
+            json.dump(self.export(), f, indent=2)
+
+    def p95(self, action=None):
+        if action is None:
+            totals = [s[3] for samples in self.samples.values() for s in samples]
+        else:
+            totals = [s[3] for s in self.samples.get(action, [])]
+        return self.percentile(totals, 95)
+
+class QualityGovernor:
+    """
+    Baisse la qualité visuelle quand les frames dépassent le budget, et la
+    remonte quand la marge revient. Chaque niveau ajoute une économie :
+    1 tuiles opaques pré-mélangées (le fond sous la grille n'est plus redessiné),
+    2 plus d'animation de survol, 3 fondus courts.
+    Un niveau n'est rétabli qu'après plusieurs fenêtres avec de la marge, et
+    ce délai double à chaque rétablissement qui n'a pas tenu.
+    """
+    LEVELS = ("complet", "tuiles opaques", "sans survol animé", "fondus courts")
+    MAX_HISTORY = 200
+    RESTORE_WINDOWS = 3
+    MAX_RESTORE_WINDOWS = 96
+
+    def __init__(self, budget_ms=1000/60, window=30, miss_ratio=0.25, headroom_ratio=0.6):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.miss_ratio = miss_ratio
+        self.headroom_ratio = headroom_ratio
+        self.level = 0
+        self.history = deque(maxlen=self.MAX_HISTORY)
+        self.frame_times = []
+        # Fenêtres avec marge à attendre avant de remonter d'un niveau
+        self.restore_windows = self.RESTORE_WINDOWS
+        self.headroom_streak = 0
+        # Fenêtres tenues depuis le dernier rétablissement, None si aucun en cours
+        self.held_since_restore = None
+
+    @property
+    def level_name(self):
+        return self.LEVELS[self.level]
+
+    @property
+    def opaque_tiles(self):
+        return self.level >= 1
+
+    @property
+    def hover_tweens(self):
+        return self.level < 2
+
+    @property
+    def short_fades(self):
+        return self.level >= 3
+
+    def frame(self, frame_ms):
+        # Renvoie True quand le niveau de qualité change
+        self.frame_times.append(frame_ms)
+        if len(self.frame_times) < self.window:
+            return False
+        misses = sum(1 for t in self.frame_times if t > self.budget_ms)
+        with_headroom = all(t <= self.budget_ms * self.headroom_ratio for t in self.frame_times)
+        mean_ms = sum(self.frame_times) / len(self.frame_times)
+        self.frame_times = []
+        if misses > self.window * self.miss_ratio and self.level < len(self.LEVELS) - 1:
+            if self.held_since_restore is not None:
+                # Le niveau rétabli n'a pas tenu : on attendra deux fois plus longtemps
+                self.restore_windows = min(self.restore_windows * 2, self.MAX_RESTORE_WINDOWS)
+                self.held_since_restore = None
+            self.headroom_streak = 0
+            self.set_level(self.level + 1, mean_ms)
+            return True
+
+        if self.held_since_restore is not None:
+            self.held_since_restore += 1
+            if self.held_since_restore >= self.restore_windows:
+                # Rétablissement confirmé : délai remis à sa valeur de base
+                self.restore_windows = self.RESTORE_WINDOWS
+                self.held_since_restore = None
+
+        if not with_headroom or self.level == 0:
+            self.headroom_streak = 0
+            return False
+        self.headroom_streak += 1
+        if self.headroom_streak < self.restore_windows:
+            return False
+        self.headroom_streak = 0
+        self.held_since_restore = 0
+        self.set_level(self.level - 1, mean_ms)
+        return True
+
+    def set_level(self, level, mean_ms=None):
+        self.history.append({
+            "time": time.time(),
+            "from": self.LEVELS[self.level],
+            "to": self.LEVELS[level],
+            "mean_frame_ms": mean_ms,
+        })
+        self.level = level
+
 class Minesweeper:
-    def __init__(self, difficulty, home_screen, music_volume, sound_volume):
+    def __init__(self, difficulty, home_screen, music_volume, sound_volume, screen_size=None):
         pygame.init()
-        self.screen = pygame.display.set_mode((0, 0), pygame.RESIZABLE)
-        pygame.display.toggle_fullscreen()
+        if screen_size is None:
+            self.screen = pygame.display.set_mode((0, 0), pygame.RESIZABLE)
+            pygame.display.toggle_fullscreen()
+        else:
+            # Fenêtre de taille imposée (ex. tests sans écran)
+            self.screen = pygame.display.set_mode(screen_size)
         self.screen_width, self.screen_height = self.screen.get_size()
         pygame.display.set_caption("Démineur Démoniaque")
 
@@ -133,7 +717,13 @@ class Minesweeper:
 
         # Background
         self.background_image = pygame.image.load(resource_path("background_game.jpg"))
-        self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height))
+        self.background_image = pygame.transform.scale(self.background_image, (self.screen_width, self.screen_height)).convert()
+
+        # Voile rouge des cases révélées, et sa version opaque pré-mélangée par case
+        self.revealed_overlay = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
+        self.revealed_overlay.fill((139, 0, 0, 128))
+        self.revealed_tiles = {}
+        self.quality_governor = QualityGovernor()
 
         self.flag_image = pygame.image.load(resource_path("flag.png"))
         self.flag_image = pygame.transform.scale(self.flag_image, (self.cell_size, self.cell_size))
@@ -145,6 +735,16 @@ class Minesweeper:
         self.music_volume = music_volume
         self.sound_volume = sound_volume
 
+        # Carte de probabilités (touche H), calculée en arrière-plan
+        self.show_heatmap = False
+        self.heatmap = {}
+        self.heatmap_font = pygame.font.SysFont("Algerian", 20)
+        self.heatmap_tiles = {}
+        self.heatmap_worker = ProbabilityWorker(self.num_mines)
+
+        # Latence clic => affichage
+        self.click_tracer = ClickLatencyTracer()
+
         # Chargement des meilleurs temps
         self.best_times = load_best_times()
         self.reset_game()
@@ -161,6 +761,7 @@ class Minesweeper:
         # Échelles
         self.reset_scale = 1.0
         self.home_scale  = 1.0
+        self.button_cache = {}
 
         # Paramètres de zoom
         self.scale_speed = 0.02
@@ -178,9 +779,10 @@ class Minesweeper:
                     self.cell_size
                 )
                 if cell.is_revealed:
-                    temp_surface = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
-                    temp_surface.fill((139, 0, 0, 128))
-                    self.screen.blit(temp_surface, rect.topleft)
+                    if self.quality_governor.opaque_tiles:
+                        self.screen.blit(self.revealed_tile(r, c, rect), rect.topleft)
+                    else:
+                        self.screen.blit(self.revealed_overlay, rect.topleft)
                     if cell.is_mine:
                         pygame.draw.circle(self.screen, (0,0,0), rect.center, self.cell_size//4)
                     elif cell.adjacent_mines>0:
@@ -191,8 +793,67 @@ class Minesweeper:
                     self.screen.blit(self.hidden_cell_image, rect.topleft)
                     if cell.is_flagged:
                         self.screen.blit(self.flag_image, rect.topleft)
+                    elif self.show_heatmap and (r, c) in self.heatmap:
+                        self.draw_probability(rect, self.heatmap[(r, c)])
                 pygame.draw.rect(self.screen, (0,0,0), rect, 1)
 
+    def revealed_tile(self, row, col, rect):
+        # Fond + voile mélangés une seule fois => blit opaque sans alpha
+        tile = self.revealed_tiles.get((row, col))
+        if tile is None:
+            tile = pygame.Surface((self.cell_size, self.cell_size))
+            tile.blit(self.background_image, (0, 0), area=rect)
+            tile.blit(self.revealed_overlay, (0, 0))
+            tile = tile.convert()
+            self.revealed_tiles[(row, col)] = tile
+        return tile
+
+    def draw_background(self):
+        if not self.quality_governor.opaque_tiles:
+            self.screen.blit(self.background_image,(0,0))
+            return
+        # Tuiles opaques : la grille recouvre tout le fond, on ne redessine que le tour
+        grid_rect = pygame.Rect(self.grid_start_x, self.grid_start_y, self.grid_width, self.grid_height)
+        for area in (
+            pygame.Rect(0, 0, self.screen_width, grid_rect.top),
+            pygame.Rect(0, grid_rect.bottom, self.screen_width, self.screen_height - grid_rect.bottom),
+            pygame.Rect(0, grid_rect.top, grid_rect.left, grid_rect.height),
+            pygame.Rect(grid_rect.right, grid_rect.top, self.screen_width - grid_rect.right, grid_rect.height),
+        ):
+            if area.width > 0 and area.height > 0:
+                self.screen.blit(self.background_image, area.topleft, area)
+
+    def draw_probability(self, rect, probability):
+        # Une tuile (teinte + pourcentage) par pourcent, construite une seule fois
+        percent = round(probability * 100)
+        tile = self.heatmap_tiles.get(percent)
+        if tile is None:
+            # Du vert (sûr) au rouge (mine certaine)
+            red = int(255 * percent / 100)
+            tile = pygame.Surface((self.cell_size, self.cell_size), pygame.SRCALPHA)
+            tile.fill((red, 255 - red, 0, 110))
+            text_surface = self.heatmap_font.render(f"{percent}%", True, (255, 255, 255))
+            tile.blit(text_surface, text_surface.get_rect(center=tile.get_rect().center))
+            self.heatmap_tiles[percent] = tile
+        self.screen.blit(tile, rect.topleft)
+
+    def board_snapshot(self):
+        return tuple(
+            tuple(cell.adjacent_mines if cell.is_revealed else None for cell in row)
+            for row in self.grid
+        )
+
+    def request_heatmap(self):
+        # Relance le calcul après un coup ; l'ancien calcul est annulé
+        if self.show_heatmap:
+            # Processus lancé au premier appui sur H seulement
+            self.heatmap_worker.start()
+        if not self.show_heatmap or self.first_move:
+            self.heatmap_worker.cancel()
+            self.heatmap = {}
+            return
+        self.heatmap_worker.submit(self.board_snapshot())
+
     def reveal_cell(self, row, col):
         cell = self.grid[row][col]
         if cell.is_revealed or cell.is_flagged:
@@ -256,12 +917,17 @@ class Minesweeper:
         image = pygame.image.load(resource_path(image_path))
         image = pygame.transform.scale(image, (self.screen.get_width(),self.screen.get_height()))
         temp_surface = pygame.Surface((self.screen.get_width(), self.screen.get_height()), pygame.SRCALPHA)
-        for alpha in range(0,256,5):
+        step = 51 if self.quality_governor.short_fades else 5
+        for alpha in range(0,256,step):
             temp_surface.fill((0,0,0,0))
             temp_surface.blit(image,(0,0))
             temp_surface.set_alpha(alpha)
             self.screen.blit(temp_surface,(0,0))
+            if alpha == 0:
+                self.click_tracer.rendered()
             pygame.display.flip()
+            if alpha == 0:
+                self.click_tracer.flipped()
             pygame.time.delay(int(duration*10))
         self.reset_game()
 
@@ -275,16 +941,20 @@ class Minesweeper:
                 self.best_times[self.difficulty]=elapsed_time
                 save_best_times(self.best_times)
             play_sound("Rire démoniaque.mp3", self.sound_volume)
+            self.click_tracer.end_of_game("win")
             self.fade_in_image("Image victoire.jpg")
         else:
             play_sound("Screamer.mp3", self.sound_volume)
+            self.click_tracer.end_of_game("loss")
             self.show_screamer("Screamer démoniaque.jpg")
 
     def show_screamer(self, image_path):
         image=pygame.image.load(resource_path(image_path))
         image=pygame.transform.scale(image,(self.screen.get_width(),self.screen.get_height()))
         self.screen.blit(image,(0,0))
+        self.click_tracer.rendered()
         pygame.display.flip()
+        self.click_tracer.flipped()
         time.sleep(0.1)
         self.reset_game()
 
@@ -304,6 +974,7 @@ class Minesweeper:
             for c in range(self.num_cols):
                 self.grid[r][c]=Cell(r,c)
         self.calculate_adjacent_mines()
+        self.request_heatmap()
 
     def start_timer(self):
         self.start_time=time.time()
@@ -328,6 +999,12 @@ class Minesweeper:
             self.screen.blit(timer_text,(10,self.screen_height-40))
 
     def update_scales(self, mouse_x, mouse_y, reset_rect, home_rect):
+        if not self.quality_governor.hover_tweens:
+            # Pas d'animation : on passe directement à la taille finale
+            self.reset_scale = self.max_scale if reset_rect.collidepoint(mouse_x, mouse_y) else self.min_scale
+            self.home_scale = self.max_scale if home_rect.collidepoint(mouse_x, mouse_y) else self.min_scale
+            return
+
         # Survol reset
         if reset_rect.collidepoint(mouse_x, mouse_y):
             self.reset_scale = min(self.reset_scale + self.scale_speed, self.max_scale)
@@ -341,6 +1018,16 @@ class Minesweeper:
             self.home_scale = max(self.home_scale - self.scale_speed, self.min_scale)
 
 
+    def scaled_button(self, name, image, size):
+        if self.quality_governor.hover_tweens:
+            return pygame.transform.scale(image, size)
+        # Sans animation, seules les tailles 1.0 et 1.2 existent : on les garde en cache
+        surf = self.button_cache.get((name, size))
+        if surf is None:
+            surf = pygame.transform.scale(image, size)
+            self.button_cache[(name, size)] = surf
+        return surf
+
     def draw_buttons(self):
         """
         On part de base 180×60 => on applique self.reset_scale, etc.
@@ -356,8 +1043,8 @@ class Minesweeper:
         home_h  = int(hh * self.home_scale)
 
         # On scale l'image
-        reset_surf = pygame.transform.scale(self.reset_btn_img, (reset_w, reset_h))
-        home_surf  = pygame.transform.scale(self.home_btn_img,  (home_w,  home_h))
+        reset_surf = self.scaled_button("reset", self.reset_btn_img, (reset_w, reset_h))
+        home_surf  = self.scaled_button("home",  self.home_btn_img,  (home_w,  home_h))
 
 
         # On place ces images
@@ -381,42 +1068,81 @@ class Minesweeper:
 
         return reset_rect, home_rect
 
+    def run_frame(self):
+        """
+        Une frame de jeu ; renvoie False quand la partie est quittée.
+        """
+        running=True
+        frame_start = time.perf_counter()
+        self.draw_background()
+        reset_rect, home_rect = self.draw_buttons()
+
+        events = pygame.event.get()
+        pulled_at = time.perf_counter()
+        for event in events:
+            if event.type==pygame.QUIT:
+                running=False
+            elif event.type==pygame.MOUSEBUTTONDOWN:
+                trace = self.click_tracer.start(pulled_at)
+                x,y=event.pos
+                if reset_rect.collidepoint(x,y):
+                    self.reset_game()
+                    self.click_tracer.action_done(trace, "reset")
+                elif home_rect.collidepoint(x,y):
+                    running=False
+                    self.heatmap_worker.stop()
+                    self.export_latency()
+                    self.home_screen.run()
+                else:
+                    x-=self.grid_start_x
+                    y-=self.grid_start_y
+                    if 0<=x<self.grid_width and 0<=y<self.grid_height:
+                        row, col = y//self.cell_size, x//self.cell_size
+                        if event.button==1:
+                            self.reveal_cell(row,col)
+                            self.click_tracer.action_done(trace, "reveal")
+                            self.request_heatmap()
+                        elif event.button==3:
+                            self.toggle_flag(row,col)
+                            self.click_tracer.action_done(trace, "flag")
+                            self.request_heatmap()
+            elif event.type==pygame.KEYDOWN and event.key==pygame.K_h:
+                self.show_heatmap = not self.show_heatmap
+                self.request_heatmap()
+
+        # Résultat du calcul en arrière-plan => affiché à cette frame
+        heatmap = self.heatmap_worker.poll()
+        if heatmap is not None:
+            self.heatmap = heatmap
+
+        # Survol => update scales
+        mx,my = pygame.mouse.get_pos()
+        self.update_scales(mx, my, reset_rect, home_rect)
+
+        self.draw_grid()
+        self.update_timer()
+        self.click_tracer.rendered()
+        pygame.display.flip()
+        self.click_tracer.flipped()
+
+        self.quality_governor.frame((time.perf_counter() - frame_start) * 1000)
+        return running
+
     def run(self):
         running=True
         while running:
-            self.screen.blit(self.background_image,(0,0))
-            reset_rect, home_rect = self.draw_buttons()
-
-            for event in pygame.event.get():
-                if event.type==pygame.QUIT:
-                    running=False
-                elif event.type==pygame.MOUSEBUTTONDOWN:
-                    x,y=event.pos
-                    if reset_rect.collidepoint(x,y):
-                        self.reset_game()
-                    elif home_rect.collidepoint(x,y):
-                        running=False
-                        self.home_screen.run()
-                    else:
-                        x-=self.grid_start_x
-                        y-=self.grid_start_y
-                        if 0<=x<self.grid_width and 0<=y<self.grid_height:
-                            row, col = y//self.cell_size, x//self.cell_size
-                            if event.button==1:
-                                self.reveal_cell(row,col)
-                            elif event.button==3:
-                                self.toggle_flag(row,col)
-
-            # Survol => update scales
-            mx,my = pygame.mouse.get_pos()
-            self.update_scales(mx, my, reset_rect, home_rect)
-
-            self.draw_grid()
-            self.update_timer()
-            pygame.display.flip()
+            running=self.run_frame()
 
+        self.heatmap_worker.stop()
+        self.export_latency()
         pygame.quit()
 
+    def export_latency(self):
+        # Export des latences de la session si DEMINEUR_LATENCE donne un fichier
+        filepath = os.environ.get("DEMINEUR_LATENCE")
+        if filepath:
+            self.click_tracer.export_json(filepath)
+
 class HomeScreen:
     def __init__(self):
         pygame.init()
@@ -708,7 +1434,59 @@ class SettingsScreen:
                         self.sound_volume=min(max(new_val,0.0),1.0)
             pygame.time.delay(10)
 
+def check_click_latency(budget_ms=50.0, difficulty=HARD, clicks=60, seed=0, export_path=None):
+    """
+    Test de non-régression sans écran : joue une partie avec des clics
+    synthétiques (sans jamais toucher de mine ni gagner) et vérifie que le
+    p95 de la latence clic => affichage reste sous budget_ms.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    random.seed(seed)
+    rows, cols, _ = difficulty
+    grid_w, grid_h = cols*CASE_SIZES[difficulty], rows*CASE_SIZES[difficulty]
+    # Assez de marge pour que la grille ne chevauche pas les boutons du bas
+    game = Minesweeper(difficulty, None, 0.0, 0.0, screen_size=(grid_w + 100, grid_h + 300))
+    clicked = 0
+
+    def click(row, col, button):
+        nonlocal clicked
+        pos = (game.grid_start_x + col*game.cell_size + game.cell_size//2,
+               game.grid_start_y + row*game.cell_size + game.cell_size//2)
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button))
+        game.run_frame()
+        clicked += 1
+
+    click(game.num_rows//2, game.num_cols//2, 1)
+    for _ in range(clicks):
+        hidden_safe = [(cell.row, cell.col) for row in game.grid for cell in row
+                       if not cell.is_revealed and not cell.is_mine]
+        mines = [(cell.row, cell.col) for row in game.grid for cell in row if cell.is_mine]
+        # On s'arrête avant la dernière case sûre pour ne pas lancer l'écran de victoire
+        if len(hidden_safe) <= 1:
+            break
+        if random.random() < 0.2:
+            click(*random.choice(mines), 3)
+        else:
+            click(*random.choice(hidden_safe), 1)
+
+    game.heatmap_worker.stop()
+    if export_path:
+        game.click_tracer.export_json(export_path)
+    p95 = game.click_tracer.p95()
+    # Un clic non tracé veut dire qu'il n'a pas atteint la grille
+    traced = sum(len(samples) for samples in game.click_tracer.samples.values())
+    pygame.quit()
+    return traced == clicked and p95 <= budget_ms, p95
+
 # Point d'entrée
 if __name__=="__main__":
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1]=="--check-latence":
+        budget = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+        export_path = sys.argv[3] if len(sys.argv) > 3 else None
+        ok, p95 = check_click_latency(budget, export_path=export_path)
+        print(f"p95 latence clic: {p95:.1f}ms (budget {budget}ms)")
+        sys.exit(0 if ok else 1)
     home_screen=HomeScreen()
     home_screen.run()